@@ -55,7 +55,7 @@ update_system() {
 # Function to install dependencies
 install_dependencies() {
     print_step "Installing required packages..."
-    apt install -y python3 python3-pip python3-venv git curl wget unzip ffmpeg
+    apt install -y python3 python3-pip python3-venv git curl wget unzip ffmpeg aria2
     
     # Verify installations
     print_status "Verifying installations..."
@@ -97,6 +97,11 @@ yt-dlp==2023.7.6
 asyncio
 aiofiles
 python-dotenv==1.0.0
+orjson
+msgpack
+telethon
+sortedcontainers
+uvloop
 EOF
     
     print_status "Bot files downloaded successfully"
@@ -135,6 +140,11 @@ BOT_TOKEN=$BOT_TOKEN
 ADMIN_USER_IDS=$ADMIN_ID
 MAX_DURATION_MINUTES=120
 MAX_FILE_SIZE_MB=2048
+MAX_CONCURRENT_DOWNLOADS=4
+LOG_LEVEL=INFO
+# Optional: API credentials from my.telegram.org enable fast parallel uploads
+TELEGRAM_API_ID=
+TELEGRAM_API_HASH=
 EOF
     
     print_status "Environment variables configured"
@@ -4,45 +4,83 @@ import tempfile
 import time
 import re
 import json
+import html
+import shutil
+import random
+import secrets
 from datetime import datetime
+from pathlib import Path
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram.constants import ParseMode
+from telegram.ext import Application, BaseRateLimiter, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 import yt_dlp
 import asyncio
+from collections import deque
+from itertools import islice
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from dotenv import load_dotenv
+from sortedcontainers import SortedKeyList
+
+try:
+    import orjson  # Much faster JSON (de)serialization for the user database
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop  # Faster drop-in event loop
+except ImportError:
+    uvloop = None
+
+try:
+    import msgpack  # Compact binary framing for the download journal
+except ImportError:
+    msgpack = None
+
+try:
+    # Parallel MTProto uploads for large files
+    from telethon import TelegramClient, utils as telethon_utils
+    from telethon.tl.functions.upload import SaveBigFilePartRequest
+    from telethon.tl.types import (
+        InputFileBig, DocumentAttributeAudio, DocumentAttributeVideo,
+        InputPeerUser, InputPeerChat, InputPeerChannel, PeerUser, PeerChat
+    )
+except ImportError:
+    TelegramClient = None
+
+# Load environment variables from .env next to the script before reading any settings
+env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(env_path)
 
 # Bot token from environment or fallback
 BOT_TOKEN = os.getenv("BOT_TOKEN", "8309584216:AAGdAKCK1C-3hikzybWI_O2r5L_NE7NRYQA")
 
 # Admin user IDs (can download unlimited duration)
-ADMIN_USER_IDS = set()
+ADMIN_USER_IDS = frozenset()
 admin_ids_str = os.getenv("ADMIN_USER_IDS", "")
 if admin_ids_str:
-    ADMIN_USER_IDS = set(int(uid.strip()) for uid in admin_ids_str.split(",") if uid.strip())
+    ADMIN_USER_IDS = frozenset(int(uid.strip()) for uid in admin_ids_str.split(",") if uid.strip())
+IS_ADMIN_USER_COUNT = len(ADMIN_USER_IDS)
 
 # Configuration
 MAX_DURATION_MINUTES = int(os.getenv("MAX_DURATION_MINUTES", "120"))  # 2 hours default
 MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "2048"))  # 2GB default
-
-def load_env_file():
-    """Load environment variables from .env file manually"""
-    env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
-    if os.path.exists(env_path):
-        try:
-            with open(env_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        os.environ[key.strip()] = value.strip()
-        except Exception as e:
-            print(f"Warning: Could not load .env file: {e}")
-    else:
-        print("Warning: .env file not found, using defaults")
-
-# Load environment variables
-load_env_file()
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "4"))  # Across all users
+
+# Telegram API credentials from my.telegram.org enable parallel uploads through Telethon
+TELEGRAM_API_ID = os.getenv("TELEGRAM_API_ID", "")
+TELEGRAM_API_HASH = os.getenv("TELEGRAM_API_HASH", "")
+FAST_UPLOAD_WORKERS = int(os.getenv("FAST_UPLOAD_WORKERS", "8"))
+
+# Fetch DASH/HLS fragments in parallel instead of one at a time
+YTDLP_SPEED_OPTS = {
+    'concurrent_fragment_downloads': int(os.getenv("YTDLP_CONCURRENT_FRAGS", "8")),
+    'http_chunk_size': 10 * 1024 * 1024,  # 10MB ranged requests avoid YouTube throttling
+}
+if shutil.which('aria2c'):
+    # aria2c opens multiple connections per file when it is installed
+    YTDLP_SPEED_OPTS['external_downloader'] = {'default': 'aria2c'}
+    YTDLP_SPEED_OPTS['external_downloader_args'] = {'aria2c': ['-x', '16', '-s', '16', '-k', '1M']}
 
 # Configure logging
 logging.basicConfig(
@@ -50,78 +88,312 @@ logging.basicConfig(
     level=logging.WARNING  # Changed from INFO to WARNING to reduce logs
 )
 logger = logging.getLogger(__name__)
+# The bot's own messages follow LOG_LEVEL; third-party libraries stay at WARNING
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+if not os.path.exists(env_path):
+    logger.info(".env file not found, using defaults")
 
 # Suppress HTTP request logs from httpx
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("telegram").setLevel(logging.WARNING)
 
 # Thread pool for blocking operations
-executor = ThreadPoolExecutor(max_workers=1)  # Only 1 worker for sequential processing
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS)
+
+# Bounds how many downloads run at once; active_downloads still limits each chat to one
+_DOWNLOAD_SEM = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+# Separate single worker for database I/O so journal appends and snapshots run in order
+db_executor = ThreadPoolExecutor(max_workers=1)
+
+@dataclass(slots=True)
+class DownloadState:
+    """Latest progress of a chat's active download, as shown by /status"""
+    percent: str = 'N/A'
+    speed: str = 'N/A'
+    eta: str = 'N/A'
+    size_info: str = 'N/A'
+
+# Global state to track active downloads, one DownloadState per chat
+active_downloads = {}
+
+# Quality buttons carry a short id mapped to the URL and its extracted video info,
+# keeping callback data under Telegram's 64 byte limit
+CALLBACK_TTL = 600  # 10 minutes
+_CALLBACK_MAP = {}
+
+def register_download_options(url, info):
+    """Remember the URL and video info behind a quality prompt, return its callback id"""
+    now = time.time()
+    # Drop expired entries so abandoned prompts don't pile up
+    for expired_id in [cb_id for cb_id, (created_at, _, _) in _CALLBACK_MAP.items() if now - created_at > CALLBACK_TTL]:
+        del _CALLBACK_MAP[expired_id]
+    cb_id = secrets.token_urlsafe(6)
+    _CALLBACK_MAP[cb_id] = (now, url, info)
+    return cb_id
+
+def pop_download_options(cb_id):
+    """Take the (url, info) behind a callback id, or None if unknown or expired"""
+    entry = _CALLBACK_MAP.pop(cb_id, None)
+    if entry and time.time() - entry[0] <= CALLBACK_TTL:
+        return entry[1], entry[2]
+    return None
+
+# Quality buttons as (label, callback prefix) rows; only the callback id changes per video
+QUALITY_KEYBOARD_LAYOUT = (
+    (("🎬 480p Video", "video_480p"), ("🎬 720p Video", "video_720p")),
+    (("🎬 1080p Video", "video_1080p"), ("🎵 Audio Only (192kbps)", "audio_192")),
+)
 
-# Global state to track active downloads
-active_downloads = set()
-download_stats = {}
+def build_quality_keyboard(cb_id):
+    """Build the quality selection keyboard for a callback id"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label, callback_data=f"{prefix}_{cb_id}") for label, prefix in row]
+        for row in QUALITY_KEYBOARD_LAYOUT
+    ])
 
 # Database file path
 DATABASE_FILE = "user_downloads.json"
+# Append-only journal of download records written since the last snapshot
+# (msgpack frames when msgpack is installed, JSON lines otherwise)
+DATABASE_JOURNAL_FILE = "user_downloads.msgpack.log" if msgpack else "user_downloads.jsonl"
+
+# Seconds between background snapshots; nothing is written while no records are pending
+FLUSH_INTERVAL = 3.0
+
+# Keep only last 50 downloads per user to prevent database bloat
+RECENT_CACHE_SIZE = 50
+
+# Display formats for dates shown in /stats, rendered once when a record is written
+DOWNLOAD_DATE_FORMAT = "%m/%d %H:%M"
+FIRST_DOWNLOAD_FORMAT = "%B %d, %Y"
+LAST_DOWNLOAD_FORMAT = "%B %d, %Y at %H:%M"
 
 def load_user_database():
     """Load user download database from JSON file"""
     try:
         if os.path.exists(DATABASE_FILE):
-            with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # Read the whole file in one go and parse the bytes directly
+            with open(DATABASE_FILE, 'rb', buffering=1 << 20) as f:
+                data = f.read()
+            return orjson.loads(data) if orjson else json.loads(data)
         return {}
     except Exception as e:
-        logger.error(f"Error loading database: {e}")
+        logger.error("Error loading database: %s", e)
         return {}
 
 def save_user_database(db):
     """Save user download database to JSON file"""
+    # Write to a temp file and swap it in, so a crash mid-write never leaves a truncated database
+    tmp_file = DATABASE_FILE + ".tmp"
     try:
-        with open(DATABASE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, indent=2, ensure_ascii=False)
+        if orjson:
+            data = orjson.dumps(db, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            data = json.dumps(db, indent=2, ensure_ascii=False).encode('utf-8')
+        # Serialize fully first, then hand the bytes to the OS in a single write
+        with open(tmp_file, 'wb', buffering=1 << 20) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, DATABASE_FILE)
+        return True
     except Exception as e:
-        logger.error(f"Error saving database: {e}")
-
-def add_download_record(user_id, username, title, url, file_size_mb):
-    """Add a download record for a user"""
-    db = load_user_database()
-    user_id_str = str(user_id)
+        logger.error("Error saving database: %s", e)
+        return False
+
+def apply_download_record(db, user_id, username, download_record, download_time=None):
+    """Apply a single download record to the database in place"""
+    if download_time is None:
+        download_time = datetime.fromisoformat(download_record['download_date'])
+    # Journaled records from before display dates were stored lack the field
+    download_record.setdefault('download_date_display', download_time.strftime(DOWNLOAD_DATE_FORMAT))
     
     # Initialize user record if doesn't exist
-    if user_id_str not in db:
-        db[user_id_str] = {
+    if user_id not in db:
+        db[user_id] = {
             'username': username,
             'total_downloads': 0,
             'total_size_mb': 0,
-            'first_download': datetime.now().isoformat(),
-            'last_download': datetime.now().isoformat(),
-            'downloads': []
+            'first_download': download_record['download_date'],
+            'first_download_display': download_time.strftime(FIRST_DOWNLOAD_FORMAT),
+            'last_download': download_record['download_date'],
+            'downloads': deque(maxlen=RECENT_CACHE_SIZE)
         }
     
     # Update user stats
-    db[user_id_str]['username'] = username  # Update in case username changed
-    db[user_id_str]['total_downloads'] += 1
-    db[user_id_str]['total_size_mb'] += file_size_mb
-    db[user_id_str]['last_download'] = datetime.now().isoformat()
+    user_record = db[user_id]
+    user_record['username'] = username  # Update in case username changed
+    user_record['total_downloads'] += 1
+    user_record['total_size_mb'] += download_record['file_size_mb']
+    user_record['last_download'] = download_record['download_date']
+    user_record['last_download_display'] = download_time.strftime(LAST_DOWNLOAD_FORMAT)
+    user_record['downloads'].append(download_record)  # Bounded deque drops the oldest
+    
+    return user_record
+
+def read_journal_entries():
+    """Yield the entries stored in the download journal"""
+    if msgpack:
+        with open(DATABASE_JOURNAL_FILE, 'rb') as f:
+            # A torn frame at the end of the file simply ends the stream
+            yield from msgpack.Unpacker(f, raw=False)
+        return
+    
+    with open(DATABASE_JOURNAL_FILE, 'rb') as f:
+        for line in f:
+            try:
+                yield orjson.loads(line) if orjson else json.loads(line)
+            except ValueError:
+                # Torn line left behind by a crash mid-append
+                continue
+
+def replay_download_journal(db):
+    """Replay journaled download records newer than the snapshot, return how many were applied"""
+    if not os.path.exists(DATABASE_JOURNAL_FILE):
+        return 0
+    
+    replayed = 0
+    try:
+        for entry in read_journal_entries():
+            user_id = int(entry['user_id'])
+            user_record = db.get(user_id)
+            download_record = entry['record']
+            # Records up to the user's last download are already in the snapshot
+            if user_record and download_record['download_date'] <= user_record['last_download']:
+                continue
+            
+            apply_download_record(db, user_id, entry['username'], download_record)
+            replayed += 1
+    except Exception as e:
+        logger.error("Error replaying database journal: %s", e)
+    return replayed
+
+# In-memory user database keyed by int user id, loaded on first use by get_db() and kept
+# in sync with the journal; ids are only turned back into strings when the snapshot is written
+_DB_CACHE = None
+# (user_id, total_downloads) pairs kept sorted by downloads, most first
+_LEADERBOARD = SortedKeyList(key=lambda entry: -entry[1])
+_DB_LOCK = asyncio.Lock()
+_JOURNAL_FH = open(DATABASE_JOURNAL_FILE, 'ab', buffering=1 << 16)
+if msgpack:
+    _JOURNAL_PACKER = msgpack.Packer(use_bin_type=True)
+
+# Journaled records not yet folded into the snapshot, and the background flusher task
+_pending_records = 0
+_db_flusher_task = None
+# Bumped on every database change so derived views know when to re-render
+_db_version = 0
+
+def append_journal_entry(entry):
+    """Append one download record to the journal"""
+    try:
+        if msgpack:
+            _JOURNAL_FH.write(_JOURNAL_PACKER.pack(entry))
+        elif orjson:
+            _JOURNAL_FH.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+        else:
+            _JOURNAL_FH.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b"\n")
+        _JOURNAL_FH.flush()
+    except Exception as e:
+        logger.error("Error writing database journal: %s", e)
+
+def compact_user_database(db):
+    """Write the database to the JSON snapshot and start an empty journal"""
+    _JOURNAL_FH.flush()
+    if save_user_database(db):
+        _JOURNAL_FH.truncate(0)
+        return True
+    return False
+
+def snapshot_user_database(db):
+    """Copy the database into plain JSON-serializable containers, safe to save off the event loop"""
+    # Download records are never mutated once written, so only the containers need copying
+    return {
+        str(user_id): {**user_record, 'downloads': list(user_record['downloads'])}
+        for user_id, user_record in db.items()
+    }
+
+def get_db():
+    """Return the in-memory user database, loading it from disk on first use"""
+    global _DB_CACHE
+    if _DB_CACHE is None:
+        db = {int(user_id_str): user_record for user_id_str, user_record in load_user_database().items()}
+        for user_record in db.values():
+            user_record['downloads'] = deque(user_record['downloads'], maxlen=RECENT_CACHE_SIZE)
+        replayed = replay_download_journal(db)
+        _LEADERBOARD.update((user_id, user_record['total_downloads']) for user_id, user_record in db.items())
+        _DB_CACHE = db
+        # Fold any records recovered from the journal into a fresh snapshot
+        if replayed:
+            compact_user_database(snapshot_user_database(db))
+    return _DB_CACHE
+
+async def flush_user_database():
+    """Snapshot the database if there are journaled records not yet saved"""
+    global _pending_records
+    async with _DB_LOCK:
+        pending = _pending_records
+        if not pending:
+            return
+        snapshot = snapshot_user_database(_DB_CACHE)
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(db_executor, compact_user_database, snapshot):
+            _pending_records -= pending
+
+async def _db_flusher():
+    """Snapshot the database every FLUSH_INTERVAL seconds while records are pending"""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await flush_user_database()
+        except Exception as e:
+            logger.error("Error flushing database: %s", e)
+
+async def start_db_flusher(application):
+    """Start the background database flusher"""
+    global _db_flusher_task
+    _db_flusher_task = asyncio.create_task(_db_flusher())
+
+async def stop_db_flusher(application):
+    """Stop the background database flusher and save whatever is still pending"""
+    if _db_flusher_task:
+        _db_flusher_task.cancel()
+        try:
+            await _db_flusher_task
+        except asyncio.CancelledError:
+            pass
+    await flush_user_database()
+
+async def add_download_record_async(user_id, username, title, url, file_size_mb):
+    """Add a download record for a user"""
+    global _pending_records, _db_version
+    # One timestamp serves as the record date and the user's first/last download
+    now = datetime.now()
     
     # Add download record
     download_record = {
         'title': title,
         'url': url,
         'file_size_mb': round(file_size_mb, 2),
-        'download_date': datetime.now().isoformat()
+        'download_date': now.isoformat(),
+        'download_date_display': now.strftime(DOWNLOAD_DATE_FORMAT)
     }
+    db = get_db()
+    previous_record = db.get(user_id)
+    if previous_record:
+        _LEADERBOARD.remove((user_id, previous_record['total_downloads']))
+    user_record = apply_download_record(db, user_id, username, download_record, now)
+    _LEADERBOARD.add((user_id, user_record['total_downloads']))
+    _db_version += 1
     
-    db[user_id_str]['downloads'].append(download_record)
+    # Append the record to the journal instead of rewriting the whole database
+    entry = {'user_id': user_id, 'username': username, 'record': download_record}
+    _pending_records += 1
+    # The background flusher picks up the pending record for the next snapshot
+    await asyncio.get_running_loop().run_in_executor(db_executor, append_journal_entry, entry)
     
-    # Keep only last 50 downloads per user to prevent database bloat
-    if len(db[user_id_str]['downloads']) > 50:
-        db[user_id_str]['downloads'] = db[user_id_str]['downloads'][-50:]
-    
-    save_user_database(db)
-    return db[user_id_str]
+    return user_record
 
 def is_admin(user_id):
     """Check if user is admin"""
@@ -136,31 +408,97 @@ def format_duration(seconds):
     else:
         return f"{minutes}m"
 
+# Regular users' duration limit, formatted once for the command texts
+MAX_DUR_STR = format_duration(MAX_DURATION_MINUTES * 60)
+
+def get_display_date(record, field, date_format):
+    """Return the stored display string for a date field, formatting it for records saved without one"""
+    display = record.get(field + '_display')
+    if display is None:
+        display = datetime.fromisoformat(record[field]).strftime(date_format)
+    return display
+
 def get_user_stats(user_id):
     """Get user download statistics"""
-    db = load_user_database()
-    user_id_str = str(user_id)
-    return db.get(user_id_str, None)
-    """Get user download statistics"""
-    db = load_user_database()
-    user_id_str = str(user_id)
-    return db.get(user_id_str, None)
+    return get_db().get(user_id)
+
+# Precompiled patterns used on every progress tick and incoming message
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+_PCT_RE = re.compile(r'(\d+\.?\d*)%')
+_YT_URL_RE = re.compile(r'https?://(?:www\.|m\.)?(?:youtube\.com/watch\?v=|youtu\.be/)\S+')
+
+# Progress bar strings for 0-10 filled segments
+_BAR_CACHE = tuple('█' * i + '░' * (10 - i) for i in range(11))
+
+class TokenBucket:
+    """Simple token bucket rate limiter"""
+    def __init__(self, capacity, refill_per_sec):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_sec)
+        self.updated_at = now
+        
+    def try_consume(self):
+        """Take a token if one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+        
+    async def consume(self):
+        """Wait until a token is available, then take it"""
+        while not self.try_consume():
+            await asyncio.sleep((1 - self.tokens) / self.refill_per_sec)
+
+# Per-chat message edit budget: bursts of 3, refilling one edit every 2 seconds
+_EDIT_BUCKETS = {}
+
+def get_edit_bucket(chat_id):
+    """Get the message edit rate limiter for a chat"""
+    bucket = _EDIT_BUCKETS.get(chat_id)
+    if bucket is None:
+        bucket = _EDIT_BUCKETS[chat_id] = TokenBucket(capacity=3, refill_per_sec=0.5)
+    return bucket
+
+class BotRateLimiter(BaseRateLimiter):
+    """Keep outgoing Bot API requests under Telegram's bot-wide limit of 30 messages per second"""
+    def __init__(self, max_rate=30):
+        self.bucket = TokenBucket(capacity=max_rate, refill_per_sec=max_rate)
+        
+    async def initialize(self):
+        pass
+        
+    async def shutdown(self):
+        pass
+        
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        # getUpdates never reaches the limiter, so only real sends wait for a token
+        await self.bucket.consume()
+        return await callback(*args, **kwargs)
 
 class ProgressHook:
-    def __init__(self, chat_id, message):
+    def __init__(self, chat_id, message, header="🎵 *Downloading Audio*"):
         self.chat_id = chat_id
         self.message = message
+        self.header = header
+        self.state = active_downloads.get(chat_id)
         self.last_update = 0
         self.start_time = time.time()
         self.latest_progress = None
+        self.last_edit = 0
+        # Set from the download thread whenever new progress text is available
+        self.updated = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
         
     def clean_ansi(self, text):
         """Remove ANSI color codes from text"""
-        if not text:
-            return text
-        # Remove ANSI escape sequences
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', str(text)).strip()
+        return _ANSI_RE.sub('', str(text)).strip() if text else text
         
     def __call__(self, d):
         current_time = time.time()
@@ -178,7 +516,7 @@ class ProgressHook:
                 eta_raw = self.clean_ansi(d.get('_eta_str', 'N/A'))
                 
                 # Extract numeric percentage
-                percent_match = re.search(r'(\d+\.?\d*)%', percent_raw)
+                percent_match = _PCT_RE.search(percent_raw)
                 if percent_match:
                     percent_num = float(percent_match.group(1))
                     percent_display = f"{percent_num:.1f}%"
@@ -200,58 +538,75 @@ class ProgressHook:
                 # Create progress bar (safe calculation)
                 progress_bars = int(percent_num / 10) if percent_num <= 100 else 10
                 progress_bars = max(0, min(10, progress_bars))  # Ensure between 0-10
-                filled_bars = '█' * progress_bars
-                empty_bars = '░' * (10 - progress_bars)
+                bar = _BAR_CACHE[progress_bars]
                 
                 # Create progress text (escaped for Markdown)
-                progress_text = f"""🎵 *Downloading Audio*
+                progress_text = f"""{self.header}
 
 📊 *Progress:* {percent_display}
 📦 *Size:* {size_info}
 ⚡ *Speed:* {speed_raw}
 ⏱️ *ETA:* {eta_raw}
 
-{filled_bars}{empty_bars}
+{bar}
 """
                 
-                # Store stats for potential use
-                download_stats[self.chat_id] = {
-                    'percent': percent_display,
-                    'speed': speed_raw,
-                    'eta': eta_raw,
-                    'size_info': size_info
-                }
+                # Store stats for /status
+                if self.state:
+                    self.state.percent = percent_display
+                    self.state.speed = speed_raw
+                    self.state.eta = eta_raw
+                    self.state.size_info = size_info
                 
-                # Schedule message update for the next event loop iteration
-                # Store the progress text to be updated by the main async function
+                # Store the progress text and wake the async updater
                 self.latest_progress = progress_text
+                self._loop.call_soon_threadsafe(self.updated.set)
                 
             except Exception as e:
-                logger.warning(f"Error in progress hook: {e}")
+                logger.warning("Error in progress hook: %s", e)
+            
+    async def wait_for_progress(self, timeout=30):
+        """Wait for new progress text, return it or None if nothing arrived"""
+        try:
+            await asyncio.wait_for(self.updated.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.updated.clear()
+        
+        # Keep at least 2 seconds between edits to respect Telegram rate limits
+        delay = 2 - (time.time() - self.last_edit)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.last_edit = time.time()
+        
+        progress_text, self.latest_progress = self.latest_progress, None
+        return progress_text
             
     async def _update_message(self, text):
+        # Drop this update if the chat is out of edit budget; the next one supersedes it
+        if not get_edit_bucket(self.chat_id).try_consume():
+            return
         try:
             await self.message.edit_text(text, parse_mode='Markdown')
         except Exception as e:
-            logger.warning(f"Failed to update progress message: {e}")
+            logger.warning("Failed to update progress message: %s", e)
 
-async def download_youtube_audio(url: str, chat_id: str, progress_message) -> str:
-    """Download YouTube audio and return the file path"""
+async def _progress_loop(hook, chat_id):
+    """Update the progress message whenever the hook reports progress, until the download ends"""
+    while chat_id in active_downloads:
+        try:
+            progress_text = await hook.wait_for_progress()
+            if progress_text:
+                await hook._update_message(progress_text)
+        except Exception as e:
+            logger.warning("Progress update error: %s", e)
+            break
+
+async def download_youtube_audio(url: str, chat_id: str, progress_message, info=None) -> str:
+    """Download YouTube audio and return the file path, title, file size and yt-dlp info"""
     # Create progress hook
     progress_hook = ProgressHook(chat_id, progress_message)
     
-    async def update_progress_periodically():
-        """Periodically update the progress message"""
-        while chat_id in active_downloads:
-            try:
-                if hasattr(progress_hook, 'latest_progress') and progress_hook.latest_progress:
-                    await progress_hook._update_message(progress_hook.latest_progress)
-                    progress_hook.latest_progress = None
-                await asyncio.sleep(3)  # Update every 3 seconds
-            except Exception as e:
-                logger.warning(f"Progress update error: {e}")
-                break
-    
     def download():
         # Get the directory where the script is located (for ffmpeg binaries)
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -272,25 +627,33 @@ async def download_youtube_audio(url: str, chat_id: str, progress_message) -> st
             'retries': 5,  # More retries for large files
             'fragment_retries': 5,  # Retry fragments
             'file_access_retries': 3,  # Retry file access
+            **YTDLP_SPEED_OPTS,
         }
         
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
+                if info:
+                    # Reuse the info from the quality prompt instead of extracting again, minus
+                    # the format selection made back then so our 'format' is applied fresh
+                    video_info = ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
+                else:
+                    video_info = ydl.extract_info(url, download=True)
+                filename = ydl.prepare_filename(video_info)
                 # Replace extension with .mp3
                 mp3_filename = os.path.splitext(filename)[0] + '.mp3'
-                return mp3_filename, info.get('title', 'Unknown Title')
+                # Stat the finished file here in the worker thread
+                return mp3_filename, video_info.get('title', 'Unknown Title'), os.path.getsize(mp3_filename), video_info
         except Exception as e:
-            logger.error(f"Download error: {e}")
+            logger.error("Download error: %s", e)
             raise e
     
     # Start progress update task
-    progress_task = asyncio.create_task(update_progress_periodically())
+    progress_task = asyncio.create_task(_progress_loop(progress_hook, chat_id))
     
     try:
         # Run download in executor
-        result = await asyncio.get_event_loop().run_in_executor(executor, download)
+        async with _DOWNLOAD_SEM:
+            result = await asyncio.get_event_loop().run_in_executor(executor, download)
         return result
     finally:
         # Cancel progress update task
@@ -300,27 +663,10 @@ async def download_youtube_audio(url: str, chat_id: str, progress_message) -> st
         except asyncio.CancelledError:
             pass
 
-async def download_youtube_video(url: str, chat_id: str, quality: str, progress_message) -> str:
-    """Download YouTube video with specified quality and return the file path"""
+async def download_youtube_video(url: str, chat_id: str, quality: str, progress_message, info=None) -> str:
+    """Download YouTube video with specified quality and return the file path, title, file size and yt-dlp info"""
     # Create progress hook
-    progress_hook = ProgressHook(chat_id, progress_message)
-    
-    async def update_progress_periodically():
-        """Periodically update the progress message"""
-        while chat_id in active_downloads:
-            try:
-                if hasattr(progress_hook, 'latest_progress') and progress_hook.latest_progress:
-                    # Update progress text to show video download
-                    video_progress = progress_hook.latest_progress.replace(
-                        "🎵 *Downloading Audio*", 
-                        f"🎬 *Downloading Video ({quality})*"
-                    )
-                    await progress_hook._update_message(video_progress)
-                    progress_hook.latest_progress = None
-                await asyncio.sleep(3)
-            except Exception as e:
-                logger.warning(f"Progress update error: {e}")
-                break
+    progress_hook = ProgressHook(chat_id, progress_message, header=f"🎬 *Downloading Video ({quality})*")
     
     def download():
         # Get the directory where the script is located (for ffmpeg binaries)
@@ -344,23 +690,31 @@ async def download_youtube_video(url: str, chat_id: str, quality: str, progress_
             'retries': 5,
             'fragment_retries': 5,
             'file_access_retries': 3,
+            **YTDLP_SPEED_OPTS,
         }
         
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
-                return filename, info.get('title', 'Unknown Title')
+                if info:
+                    # Reuse the info from the quality prompt instead of extracting again, minus
+                    # the format selection made back then so our 'format' is applied fresh
+                    video_info = ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
+                else:
+                    video_info = ydl.extract_info(url, download=True)
+                filename = ydl.prepare_filename(video_info)
+                # Stat the finished file here in the worker thread
+                return filename, video_info.get('title', 'Unknown Title'), os.path.getsize(filename), video_info
         except Exception as e:
-            logger.error(f"Download error: {e}")
+            logger.error("Download error: %s", e)
             raise e
     
     # Start progress update task
-    progress_task = asyncio.create_task(update_progress_periodically())
+    progress_task = asyncio.create_task(_progress_loop(progress_hook, chat_id))
     
     try:
         # Run download in executor
-        result = await asyncio.get_event_loop().run_in_executor(executor, download)
+        async with _DOWNLOAD_SEM:
+            result = await asyncio.get_event_loop().run_in_executor(executor, download)
         return result
     finally:
         # Cancel progress update task
@@ -398,7 +752,7 @@ async def handle_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE)
     youtube_url = context.args[0]
     
     # Validate URL
-    if "youtube.com" not in youtube_url and "youtu.be" not in youtube_url:
+    if not _YT_URL_RE.match(youtube_url):
         await update.message.reply_text(
             "❌ *Invalid URL*\n\n"
             "Please provide a valid YouTube URL.\n"
@@ -430,7 +784,7 @@ async def handle_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE)
             
             if duration_seconds and duration_seconds > max_duration_seconds and not is_admin(user_id):
                 duration_formatted = format_duration(duration_seconds)
-                max_duration_formatted = format_duration(max_duration_seconds)
+                max_duration_formatted = MAX_DUR_STR
                 
                 await processing_msg.edit_text(
                     f"⏱️ *Video Too Long*\n\n"
@@ -444,17 +798,7 @@ async def handle_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 return
             
             # Create inline keyboard with quality options
-            keyboard = [
-                [
-                    InlineKeyboardButton("🎬 480p Video", callback_data=f"video_480p_{youtube_url}"),
-                    InlineKeyboardButton("🎬 720p Video", callback_data=f"video_720p_{youtube_url}")
-                ],
-                [
-                    InlineKeyboardButton("🎬 1080p Video", callback_data=f"video_1080p_{youtube_url}"),
-                    InlineKeyboardButton("🎵 Audio Only (192kbps)", callback_data=f"audio_192_{youtube_url}")
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = build_quality_keyboard(register_download_options(youtube_url, info))
             
             duration_text = f"⏰ *Duration:* {format_duration(duration_seconds)}" if duration_seconds else ""
             
@@ -470,7 +814,7 @@ async def handle_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE)
             )
     
     except Exception as e:
-        logger.error(f"Error analyzing video: {e}")
+        logger.error("Error analyzing video: %s", e)
         await processing_msg.edit_text(
             f"❌ *Error Analyzing Video*\n\n"
             f"*Error:* {str(e)[:100]}{'...' if len(str(e)) > 100 else ''}\n\n"
@@ -505,21 +849,31 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
     
     download_type = data_parts[0]  # 'video' or 'audio'
     quality = data_parts[1]        # '480p', '720p', '1080p', or quality for audio
-    youtube_url = data_parts[2]    # The YouTube URL
+    
+    # Look up the URL and video info behind the button
+    options = pop_download_options(data_parts[2])
+    if not options:
+        await query.edit_message_text(
+            "⌛ *Selection Expired*\n\n"
+            "Please send the YouTube link again.",
+            parse_mode='Markdown'
+        )
+        return
+    youtube_url, info = options
     
     # Add to active downloads
-    active_downloads.add(chat_id)
+    active_downloads[chat_id] = DownloadState()
     
     try:
         if download_type == "audio":
-            await process_audio_download(query, youtube_url, chat_id)
+            await process_audio_download(query, youtube_url, chat_id, info)
         elif download_type == "video":
-            await process_video_download(query, youtube_url, quality, chat_id)
+            await process_video_download(query, youtube_url, quality, chat_id, info)
         else:
             await query.edit_message_text("❌ Unknown download type.")
             
     except Exception as e:
-        logger.error(f"Error in callback handler: {e}")
+        logger.error("Error in callback handler: %s", e)
         await query.edit_message_text(
             f"❌ *Download Failed*\n\n"
             f"*Error:* {str(e)[:100]}{'...' if len(str(e)) > 100 else ''}\n\n"
@@ -527,11 +881,110 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
             parse_mode='Markdown'
         )
     finally:
-        # Remove from active downloads
-        active_downloads.discard(chat_id)
-        download_stats.pop(chat_id, None)
+        # Remove from active downloads and drop the chat's edit budget along with it
+        active_downloads.pop(chat_id, None)
+        _EDIT_BUCKETS.pop(chat_id, None)
+
+# Telethon client used for large uploads, connected on startup when configured
+upload_client = None
+
+# Files above this size are uploaded in parallel parts (MTProto's "big file" threshold)
+FAST_UPLOAD_MIN_SIZE = 10 * 1024 * 1024
+UPLOAD_PART_SIZE = 512 * 1024  # Largest part size MTProto accepts
+UPLOAD_MAX_PARTS = 4000  # Most parts MTProto accepts per file, 2000 MiB at the largest part size
+
+# Captions for Telethon uploads, in HTML so titles only need html.escape
+FAST_AUDIO_CAPTION_TEMPLATE = "🎵 <b>{title}</b>\n\n📦 Size: {size_mb:.1f} MB\n🎧 Quality: 192 kbps MP3"
+FAST_VIDEO_CAPTION_TEMPLATE = "🎬 <b>{title}</b>\n\n📦 Size: {size_mb:.1f} MB\n📺 Quality: {quality}"
+
+def upload_limit_mb():
+    """Largest file size in MB that can be sent, capped by MTProto's part limit when Telethon uploads"""
+    if upload_client:
+        return min(MAX_FILE_SIZE_MB, UPLOAD_MAX_PARTS * UPLOAD_PART_SIZE // (1024 * 1024))
+    return MAX_FILE_SIZE_MB
+
+async def start_upload_client(application):
+    """Connect the Telethon upload client if telethon and API credentials are available"""
+    global upload_client
+    if not (TelegramClient and TELEGRAM_API_ID and TELEGRAM_API_HASH):
+        return
+    
+    try:
+        # Upload-only client; PTB handles updates, so don't fetch them here too
+        client = TelegramClient("telethon_upload", int(TELEGRAM_API_ID), TELEGRAM_API_HASH, receive_updates=False)
+        await client.start(bot_token=BOT_TOKEN)
+        upload_client = client
+    except Exception as e:
+        logger.warning("Fast upload disabled, Telethon client failed to start: %s", e)
+
+async def stop_upload_client(application):
+    """Disconnect the Telethon upload client"""
+    if upload_client:
+        await upload_client.disconnect()
+
+async def post_init(application):
+    """Start background services once the application is initialized"""
+    # Load the user database in a worker thread while the upload client connects,
+    # so the first command doesn't pay for it and the event loop never blocks on it
+    await asyncio.gather(asyncio.to_thread(get_db), start_upload_client(application))
+    await start_db_flusher(application)
+
+async def post_shutdown(application):
+    """Stop background services and persist pending database records"""
+    await stop_upload_client(application)
+    await stop_db_flusher(application)
+
+async def fast_upload(client, file_path, file_size):
+    """Upload a big file as parallel SaveBigFilePart requests and return its InputFileBig"""
+    file_id = random.getrandbits(63)
+    part_count = (file_size + UPLOAD_PART_SIZE - 1) // UPLOAD_PART_SIZE
+    parts = iter(range(part_count))
+    
+    def read_part(f, index):
+        f.seek(index * UPLOAD_PART_SIZE)
+        return f.read(UPLOAD_PART_SIZE)
+    
+    async def upload_parts():
+        f = await asyncio.to_thread(open, file_path, 'rb')
+        with f:
+            # Workers share one iterator, so each part is claimed exactly once
+            for index in parts:
+                data = await asyncio.to_thread(read_part, f, index)
+                await client(SaveBigFilePartRequest(file_id, index, part_count, data))
+    
+    workers = [asyncio.create_task(upload_parts()) for _ in range(min(FAST_UPLOAD_WORKERS, part_count))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        # One failed part fails the upload, so stop the other workers instead of orphaning them
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+    return InputFileBig(file_id, part_count, os.path.basename(file_path))
+
+def bot_input_peer(chat_id):
+    """Build a Telethon input peer from a Bot API chat id (bots may use a zero access hash)"""
+    peer_id, peer_type = telethon_utils.resolve_id(int(chat_id))
+    if peer_type is PeerUser:
+        return InputPeerUser(peer_id, 0)
+    if peer_type is PeerChat:
+        return InputPeerChat(peer_id)
+    return InputPeerChannel(peer_id, 0)
+
+async def send_file_fast(chat_id, file_path, file_size, caption, attributes):
+    """Upload a file in parallel through Telethon and send it to the chat with an HTML caption"""
+    input_file = await fast_upload(upload_client, file_path, file_size)
+    # Telethon can't probe an uploaded InputFileBig, so media attributes must be given explicitly
+    await upload_client.send_file(
+        bot_input_peer(chat_id),
+        input_file,
+        caption=caption,
+        parse_mode='html',
+        attributes=attributes
+    )
 
-async def process_audio_download(query, youtube_url: str, chat_id: str):
+async def process_audio_download(query, youtube_url: str, chat_id: str, info=None):
     """Process audio download"""
     # Update message to show download starting
     progress_msg = await query.edit_message_text(
@@ -543,9 +996,10 @@ async def process_audio_download(query, youtube_url: str, chat_id: str):
     
     try:
         # Download audio
-        file_path, title = await download_youtube_audio(youtube_url, chat_id, progress_msg)
+        file_path, title, file_size, video_info = await download_youtube_audio(youtube_url, chat_id, progress_msg, info)
         
         # Update status for upload
+        await get_edit_bucket(chat_id).consume()
         await progress_msg.edit_text(
             f"📤 *Uploading Audio to Telegram*\n\n"
             f"🎵 *Title:* {title[:50]}{'...' if len(title) > 50 else ''}\n"
@@ -554,37 +1008,48 @@ async def process_audio_download(query, youtube_url: str, chat_id: str):
             parse_mode='Markdown'
         )
         
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # File size was measured by the download worker
         file_size_mb = file_size / (1024 * 1024)
         
         # Check file size limits
-        if file_size_mb > MAX_FILE_SIZE_MB:
+        limit_mb = upload_limit_mb()
+        if file_size_mb > limit_mb:
+            await get_edit_bucket(chat_id).consume()
             await progress_msg.edit_text(
                 f"⚠️ *File Too Large*\n\n"
                 f"🎵 *Title:* {title[:50]}{'...' if len(title) > 50 else ''}\n"
                 f"📦 *Size:* {file_size_mb:.1f} MB\n"
-                f"❌ *Upload limit:* {MAX_FILE_SIZE_MB} MB\n\n"
+                f"❌ *Upload limit:* {limit_mb} MB\n\n"
                 f"*The file was downloaded but cannot be sent via Telegram.*",
                 parse_mode='Markdown'
             )
-            os.remove(file_path)
+            await asyncio.to_thread(os.remove, file_path)
             return
         
         # Send audio file
-        with open(file_path, 'rb') as audio_file:
-            await query.message.reply_audio(
-                audio=audio_file,
-                caption=f"🎵 *{title}*\n\n"
+        if upload_client and file_size > FAST_UPLOAD_MIN_SIZE:
+            await send_file_fast(
+                chat_id, file_path, file_size,
+                FAST_AUDIO_CAPTION_TEMPLATE.format(title=html.escape(title), size_mb=file_size_mb),
+                attributes=[DocumentAttributeAudio(duration=int(video_info.get('duration') or 0), title=title[:64])]
+            )
+        else:
+            caption = (f"🎵 *{title}*\n\n"
                        f"📦 Size: {file_size_mb:.1f} MB\n"
-                       f"🎧 Quality: 192 kbps MP3",
+                       f"🎧 Quality: 192 kbps MP3")
+            # python-telegram-bot reads the whole file into memory anyway, so do it off the event loop
+            audio_data = await asyncio.to_thread(Path(file_path).read_bytes)
+            await query.message.reply_audio(
+                audio=audio_data,
+                filename=os.path.basename(file_path),
+                caption=caption,
                 title=title[:64],
                 parse_mode='Markdown'
             )
         
         # Record download and show completion
         user = query.from_user
-        user_stats = add_download_record(
+        user_stats = await add_download_record_async(
             user_id=user.id,
             username=user.username or user.first_name or "Unknown",
             title=title,
@@ -592,6 +1057,7 @@ async def process_audio_download(query, youtube_url: str, chat_id: str):
             file_size_mb=file_size_mb
         )
         
+        await get_edit_bucket(chat_id).consume()
         await progress_msg.edit_text(
             f"✅ *Audio Download Complete!*\n\n"
             f"🎵 *Title:* {title[:50]}{'...' if len(title) > 50 else ''}\n"
@@ -602,7 +1068,7 @@ async def process_audio_download(query, youtube_url: str, chat_id: str):
         )
         
         # Clean up file
-        os.remove(file_path)
+        await asyncio.to_thread(os.remove, file_path)
         
         # Delete completion message after 5 seconds
         await asyncio.sleep(5)
@@ -614,7 +1080,7 @@ async def process_audio_download(query, youtube_url: str, chat_id: str):
     except Exception as e:
         raise e
 
-async def process_video_download(query, youtube_url: str, quality: str, chat_id: str):
+async def process_video_download(query, youtube_url: str, quality: str, chat_id: str, info=None):
     """Process video download"""
     # Update message to show download starting
     progress_msg = await query.edit_message_text(
@@ -626,9 +1092,10 @@ async def process_video_download(query, youtube_url: str, quality: str, chat_id:
     
     try:
         # Download video
-        file_path, title = await download_youtube_video(youtube_url, chat_id, quality, progress_msg)
+        file_path, title, file_size, video_info = await download_youtube_video(youtube_url, chat_id, quality, progress_msg, info)
         
         # Update status for upload
+        await get_edit_bucket(chat_id).consume()
         await progress_msg.edit_text(
             f"📤 *Uploading Video to Telegram*\n\n"
             f"🎬 *Title:* {title[:50]}{'...' if len(title) > 50 else ''}\n"
@@ -637,36 +1104,52 @@ async def process_video_download(query, youtube_url: str, quality: str, chat_id:
             parse_mode='Markdown'
         )
         
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # File size was measured by the download worker
         file_size_mb = file_size / (1024 * 1024)
         
         # Check file size limits
-        if file_size_mb > MAX_FILE_SIZE_MB:
+        limit_mb = upload_limit_mb()
+        if file_size_mb > limit_mb:
+            await get_edit_bucket(chat_id).consume()
             await progress_msg.edit_text(
                 f"⚠️ *File Too Large*\n\n"
                 f"🎬 *Title:* {title[:50]}{'...' if len(title) > 50 else ''}\n"
                 f"📦 *Size:* {file_size_mb:.1f} MB\n"
-                f"❌ *Upload limit:* {MAX_FILE_SIZE_MB} MB\n\n"
+                f"❌ *Upload limit:* {limit_mb} MB\n\n"
                 f"💡 Try a lower quality option.",
                 parse_mode='Markdown'
             )
-            os.remove(file_path)
+            await asyncio.to_thread(os.remove, file_path)
             return
         
         # Send video file
-        with open(file_path, 'rb') as video_file:
-            await query.message.reply_video(
-                video=video_file,
-                caption=f"🎬 *{title}*\n\n"
+        if upload_client and file_size > FAST_UPLOAD_MIN_SIZE:
+            await send_file_fast(
+                chat_id, file_path, file_size,
+                FAST_VIDEO_CAPTION_TEMPLATE.format(title=html.escape(title), size_mb=file_size_mb, quality=quality),
+                attributes=[DocumentAttributeVideo(
+                    int(video_info.get('duration') or 0),
+                    video_info.get('width') or 0,
+                    video_info.get('height') or 0,
+                    supports_streaming=True
+                )]
+            )
+        else:
+            caption = (f"🎬 *{title}*\n\n"
                        f"📦 Size: {file_size_mb:.1f} MB\n"
-                       f"📺 Quality: {quality}",
+                       f"📺 Quality: {quality}")
+            # python-telegram-bot reads the whole file into memory anyway, so do it off the event loop
+            video_data = await asyncio.to_thread(Path(file_path).read_bytes)
+            await query.message.reply_video(
+                video=video_data,
+                filename=os.path.basename(file_path),
+                caption=caption,
                 parse_mode='Markdown'
             )
         
         # Record download and show completion
         user = query.from_user
-        user_stats = add_download_record(
+        user_stats = await add_download_record_async(
             user_id=user.id,
             username=user.username or user.first_name or "Unknown",
             title=title,
@@ -674,6 +1157,7 @@ async def process_video_download(query, youtube_url: str, quality: str, chat_id:
             file_size_mb=file_size_mb
         )
         
+        await get_edit_bucket(chat_id).consume()
         await progress_msg.edit_text(
             f"✅ *Video Download Complete!*\n\n"
             f"🎬 *Title:* {title[:50]}{'...' if len(title) > 50 else ''}\n"
@@ -684,7 +1168,7 @@ async def process_video_download(query, youtube_url: str, quality: str, chat_id:
         )
         
         # Clean up file
-        os.remove(file_path)
+        await asyncio.to_thread(os.remove, file_path)
         
         # Delete completion message after 5 seconds
         await asyncio.sleep(5)
@@ -714,19 +1198,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message and update.message.text:
         text = update.message.text.strip()
         
-        # Check if the message contains a YouTube URL
-        if ("youtube.com" in text or "youtu.be" in text) and ("http" in text):
-            # Extract the URL from the text
-            import re
-            url_pattern = r'(https?://(?:www\.|m\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[^\s]+)'
-            urls = re.findall(url_pattern, text)
-            
-            if urls:
-                youtube_url = urls[0]  # Take the first URL found
-                # Call the YouTube handler with the extracted URL
-                context.args = [youtube_url]
-                await handle_youtube_url(update, context)
-                return
+        # Check if the message contains a YouTube URL (first one wins)
+        url_match = _YT_URL_RE.search(text)
+        if url_match:
+            # Call the YouTube handler with the extracted URL
+            context.args = [url_match.group(0)]
+            await handle_youtube_url(update, context)
+            return
         
         # If no YouTube URL found, show help message
         await update.message.reply_text(
@@ -741,46 +1219,44 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
-    welcome_text = """🤖 *I'm Alive!*
+    welcome_text = """🤖 <b>I'm Alive!</b>
 
-🎵 Welcome to the YouTube Video & Audio Downloader Bot!
+🎵 Welcome to the YouTube Video &amp; Audio Downloader Bot!
 
-📋 *How to use:*
-Send: `/download <youtube_url>`
+📋 <b>How to use:</b>
+Send: <code>/download &lt;youtube_url&gt;</code>
 
-*Example:*
-`/download https://www.youtube.com/watch?v=dQw4w9WgXcQ`
+<b>Example:</b>
+<code>/download https://www.youtube.com/watch?v=dQw4w9WgXcQ</code>
 
-✨ *Quality Options:*
+✨ <b>Quality Options:</b>
 • � Video: 480p, 720p, 1080p (with audio)
 • 🎵 Audio Only: MP3 (192 kbps)
 
-🎯 *Features:*
+🎯 <b>Features:</b>
 • 📊 Real-time download progress
 • 🚀 Fast processing with quality selection
 • 📱 Interactive buttons for easy selection
 • 🗂️ Automatic file cleanup to save space
 
-⚠️ *Important:*
+⚠️ <b>Important:</b>
 Only one download per user at a time for optimal performance.
 
 Type /help for more information!"""
-    await update.message.reply_text(welcome_text, parse_mode='Markdown')
+    await update.message.reply_text(welcome_text, parse_mode=ParseMode.HTML)
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /help command"""
-    help_text = """🤖 *Bot Commands & Help*
-
-*📋 Commands:*
-• `/start` - Welcome message
-• `/help` - Show this help
-• `/audio <url>` - Legacy audio command
-• `/status` - Check if you have active downloads
-• `/stats` - View your download statistics
-• `/leaderboard` - See top users
-• `/admin` - Admin panel / User info
-
-*📖 How to Use:*
+HELP_TEXT = f"""🤖 <b>Bot Commands &amp; Help</b>
+
+<b>📋 Commands:</b>
+• <code>/start</code> - Welcome message
+• <code>/help</code> - Show this help
+• <code>/audio &lt;url&gt;</code> - Legacy audio command
+• <code>/status</code> - Check if you have active downloads
+• <code>/stats</code> - View your download statistics
+• <code>/leaderboard</code> - See top users
+• <code>/admin</code> - Admin panel / User info
+
+<b>📖 How to Use:</b>
 1. Simply send me any YouTube URL directly (no commands needed!)
 2. I'll automatically detect it and show quality options
 3. Choose your preferred quality from the buttons:
@@ -791,7 +1267,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 4. Wait for download and upload to complete
 5. Receive your file!
 
-*✨ Features:*
+<b>✨ Features:</b>
 • � Multiple video quality options
 • 🎵 High-quality audio extraction
 • 📊 Real-time progress tracking
@@ -800,23 +1276,38 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • 🚀 Fast upload to Telegram
 • 🗂️ Automatic file cleanup
 
-*⚠️ Limitations:*
-• Regular users: Max {format_duration(MAX_DURATION_MINUTES * 60)} duration
+<b>⚠️ Limitations:</b>
+• Regular users: Max {MAX_DUR_STR} duration
 • Admins: Unlimited duration
 • File size limit: {MAX_FILE_SIZE_MB} MB
 • YouTube links only
 
-*🔧 Supported URLs:*
-• `https://www.youtube.com/watch?v=VIDEO_ID`
-• `https://youtu.be/VIDEO_ID`
-• `https://m.youtube.com/watch?v=VIDEO_ID`
+<b>🔧 Supported URLs:</b>
+• <code>https://www.youtube.com/watch?v=VIDEO_ID</code>
+• <code>https://youtu.be/VIDEO_ID</code>
+• <code>https://m.youtube.com/watch?v=VIDEO_ID</code>
 
-*❓ Having issues?*
+<b>❓ Having issues?</b>
 • Check your URL is correct
 • Wait for current download to finish
 • Some videos may be region-blocked
 • Try a lower quality if file is too large"""
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /help command"""
+    await update.message.reply_text(HELP_TEXT, parse_mode=ParseMode.HTML)
+
+STATS_TEXT_TEMPLATE = """📊 <b>Your Download Statistics</b>
+
+👤 <b>User:</b> {username}
+📈 <b>Total Downloads:</b> {total_downloads}
+💾 <b>Total Size:</b> {total_size_mb:.1f} MB
+📅 <b>Member Since:</b> {first_date}
+🕐 <b>Last Download:</b> {last_date}
+
+{recent_downloads}
+
+Use <code>/audio &lt;url&gt;</code> to download more!"""
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /stats command - show user download statistics"""
@@ -825,168 +1316,196 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if not user_stats:
         await update.message.reply_text(
-            "📊 *Your Download Statistics*\n\n"
+            "📊 <b>Your Download Statistics</b>\n\n"
             "❌ No downloads yet!\n\n"
-            "Use `/audio <youtube_url>` to start downloading.",
-            parse_mode='Markdown'
+            "Use <code>/audio &lt;youtube_url&gt;</code> to start downloading.",
+            parse_mode=ParseMode.HTML
         )
         return
     
     # Format last downloads
     recent_downloads = ""
-    if user_stats['downloads']:
-        recent_count = min(5, len(user_stats['downloads']))
-        recent_downloads = "\n*📋 Recent Downloads:*\n"
-        for download in user_stats['downloads'][-recent_count:]:
-            date = datetime.fromisoformat(download['download_date']).strftime("%m/%d %H:%M")
-            title = download['title'][:30] + "..." if len(download['title']) > 30 else download['title']
-            recent_downloads += f"• `{date}` - {title} ({download['file_size_mb']}MB)\n"
+    downloads = user_stats['downloads']
+    if downloads:
+        recent_count = min(5, len(downloads))
+        parts = ["\n<b>📋 Recent Downloads:</b>\n"]
+        for download in islice(downloads, len(downloads) - recent_count, None):
+            date = get_display_date(download, 'download_date', DOWNLOAD_DATE_FORMAT)
+            title = html.escape(download['title'][:30] + "..." if len(download['title']) > 30 else download['title'])
+            parts.append(f"• <code>{date}</code> - {title} ({download['file_size_mb']}MB)\n")
+        recent_downloads = "".join(parts)
     
-    first_date = datetime.fromisoformat(user_stats['first_download']).strftime("%B %d, %Y")
-    last_date = datetime.fromisoformat(user_stats['last_download']).strftime("%B %d, %Y at %H:%M")
+    first_date = get_display_date(user_stats, 'first_download', FIRST_DOWNLOAD_FORMAT)
+    last_date = get_display_date(user_stats, 'last_download', LAST_DOWNLOAD_FORMAT)
     
-    stats_text = f"""📊 *Your Download Statistics*
-
-👤 *User:* {user_stats['username']}
-📈 *Total Downloads:* {user_stats['total_downloads']}
-💾 *Total Size:* {user_stats['total_size_mb']:.1f} MB
-📅 *Member Since:* {first_date}
-🕐 *Last Download:* {last_date}
-
-{recent_downloads}
-
-Use `/audio <url>` to download more!"""
+    stats_text = STATS_TEXT_TEMPLATE.format(
+        username=html.escape(user_stats['username']),
+        total_downloads=user_stats['total_downloads'],
+        total_size_mb=user_stats['total_size_mb'],
+        first_date=first_date,
+        last_date=last_date,
+        recent_downloads=recent_downloads
+    )
+    
+    await update.message.reply_text(stats_text, parse_mode=ParseMode.HTML)
+
+LEADERBOARD_ENTRY_TEMPLATE = "{medal} <b>{username}</b>\n   📈 {total_downloads} downloads\n   💾 {total_size_mb:.1f} MB\n\n"
+# Rank label for each leaderboard slot: medals for the top 3, then plain numbers
+RANK_LABELS = ("🥇", "🥈", "🥉") + tuple(f"{i}." for i in range(4, 11))
+LEADERBOARD_POSITION_TEMPLATE = "📍 <b>Your Position: #{position}</b>\n   📈 {total_downloads} downloads\n   💾 {total_size_mb:.1f} MB"
+
+# Rendered top 10 and the database version it was rendered from
+_leaderboard_cache = None
+_leaderboard_cache_version = -1
+
+def render_leaderboard():
+    """Return the top 10 leaderboard text, re-rendering only after the database changed"""
+    global _leaderboard_cache, _leaderboard_cache_version
+    if _leaderboard_cache_version == _db_version:
+        return _leaderboard_cache
+    
+    db = get_db()
+    # Users are kept sorted by total downloads as they download
+    top_users = [(user_id, db[user_id]) for user_id, _ in _LEADERBOARD[:10]]  # Top 10 users
+    
+    parts = ["🏆 <b>Download Leaderboard</b>\n\n"]
+    
+    for medal, (user_id, stats) in zip(RANK_LABELS, top_users):
+        username = html.escape(stats['username'][:15] + "..." if len(stats['username']) > 15 else stats['username'])
+        
+        parts.append(LEADERBOARD_ENTRY_TEMPLATE.format(
+            medal=medal,
+            username=username,
+            total_downloads=stats['total_downloads'],
+            total_size_mb=stats['total_size_mb']
+        ))
     
-    await update.message.reply_text(stats_text, parse_mode='Markdown')
+    leaderboard_text = "".join(parts)
+    _leaderboard_cache = leaderboard_text
+    _leaderboard_cache_version = _db_version
+    return leaderboard_text
 
 async def leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /leaderboard command - show top users"""
-    db = load_user_database()
+    db = get_db()
     
     if not db:
         await update.message.reply_text(
-            "🏆 *Download Leaderboard*\n\n"
+            "🏆 <b>Download Leaderboard</b>\n\n"
             "❌ No users yet!\n\n"
             "Be the first to download something!",
-            parse_mode='Markdown'
+            parse_mode=ParseMode.HTML
         )
         return
     
-    # Sort users by total downloads
-    sorted_users = sorted(db.items(), key=lambda x: x[1]['total_downloads'], reverse=True)
-    top_users = sorted_users[:10]  # Top 10 users
-    
-    leaderboard_text = "🏆 *Download Leaderboard*\n\n"
-    
-    medals = ["🥇", "🥈", "🥉"]
-    for i, (user_id, stats) in enumerate(top_users):
-        medal = medals[i] if i < 3 else f"{i+1}."
-        username = stats['username'][:15] + "..." if len(stats['username']) > 15 else stats['username']
-        
-        leaderboard_text += f"{medal} *{username}*\n"
-        leaderboard_text += f"   📈 {stats['total_downloads']} downloads\n"
-        leaderboard_text += f"   💾 {stats['total_size_mb']:.1f} MB\n\n"
+    leaderboard_text = render_leaderboard()
     
     # Add current user's position if not in top 10
-    current_user_id = str(update.effective_user.id)
+    current_user_id = update.effective_user.id
     if current_user_id in db:
-        current_user_pos = next((i+1 for i, (uid, _) in enumerate(sorted_users) if uid == current_user_id), None)
-        if current_user_pos and current_user_pos > 10:
-            current_stats = db[current_user_id]
-            leaderboard_text += f"📍 *Your Position: #{current_user_pos}*\n"
-            leaderboard_text += f"   📈 {current_stats['total_downloads']} downloads\n"
-            leaderboard_text += f"   💾 {current_stats['total_size_mb']:.1f} MB"
+        current_stats = db[current_user_id]
+        current_user_pos = _LEADERBOARD.index((current_user_id, current_stats['total_downloads'])) + 1
+        if current_user_pos > 10:
+            leaderboard_text += LEADERBOARD_POSITION_TEMPLATE.format(
+                position=current_user_pos,
+                total_downloads=current_stats['total_downloads'],
+                total_size_mb=current_stats['total_size_mb']
+            )
     
-    await update.message.reply_text(leaderboard_text, parse_mode='Markdown')
+    await update.message.reply_text(leaderboard_text, parse_mode=ParseMode.HTML)
 
-async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /status command"""
-    chat_id = str(update.effective_chat.id)
-    
-    if chat_id in active_downloads:
-        stats = download_stats.get(chat_id, {})
-        status_text = f"""📊 *Download Status*
+STATUS_ACTIVE_TEMPLATE = """📊 <b>Download Status</b>
 
-🔄 *Status:* Active download in progress
-📊 *Progress:* {stats.get('percent', 'N/A')}
-⚡ *Speed:* {stats.get('speed', 'N/A')}
-⏱️ *ETA:* {stats.get('eta', 'N/A')}
-📦 *Size:* {stats.get('size_info', 'N/A')}
+🔄 <b>Status:</b> Active download in progress
+📊 <b>Progress:</b> {percent}
+⚡ <b>Speed:</b> {speed}
+⏱️ <b>ETA:</b> {eta}
+📦 <b>Size:</b> {size_info}
 
 Please wait for completion before starting a new download."""
-    else:
-        status_text = """✅ *Download Status*
 
-🔄 *Status:* No active downloads
-🚀 *Ready:* You can start a new download!
+STATUS_IDLE_TEXT = """✅ <b>Download Status</b>
 
-Use `/audio <youtube_url>` to begin downloading."""
-    
-    await update.message.reply_text(status_text, parse_mode='Markdown')
+🔄 <b>Status:</b> No active downloads
+🚀 <b>Ready:</b> You can start a new download!
+
+Use <code>/audio &lt;youtube_url&gt;</code> to begin downloading."""
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /status command"""
     chat_id = str(update.effective_chat.id)
     
-    if chat_id in active_downloads:
-        stats = download_stats.get(chat_id, {})
-        status_text = f"""📊 *Download Status*
-
-🔄 *Status:* Active download in progress
-📊 *Progress:* {stats.get('percent', 'N/A')}
-⚡ *Speed:* {stats.get('speed', 'N/A')}
-⏱️ *ETA:* {stats.get('eta', 'N/A')}
-📦 *Size:* {stats.get('size_info', 'N/A')}
-
-Please wait for completion before starting a new download."""
+    state = active_downloads.get(chat_id)
+    if state:
+        status_text = STATUS_ACTIVE_TEMPLATE.format(
+            percent=state.percent,
+            speed=state.speed,
+            eta=state.eta,
+            size_info=state.size_info
+        )
     else:
-        status_text = """✅ *Download Status*
-
-🔄 *Status:* No active downloads
-🚀 *Ready:* You can start a new download!
-
-Use `/audio <youtube_url>` to begin downloading."""
+        status_text = STATUS_IDLE_TEXT
     
-    await update.message.reply_text(status_text, parse_mode='Markdown')
+    await update.message.reply_text(status_text, parse_mode=ParseMode.HTML)
 
-async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /admin command - show admin status and controls"""
-    user = update.effective_user
-    
-    if is_admin(user.id):
-        admin_text = f"""🔧 *Admin Panel*
+# Settings are filled in once; only {username} is left for each request
+ADMIN_TEXT_TEMPLATE = f"""🔧 <b>Admin Panel</b>
 
-👤 *User:* {user.username or user.first_name}
-🛡️ *Status:* Administrator
-⏰ *Download Limit:* Unlimited duration
+👤 <b>User:</b> {{username}}
+🛡️ <b>Status:</b> Administrator
+⏰ <b>Download Limit:</b> Unlimited duration
 
-*🎛️ Current Settings:*
-• Max Duration (Regular): {MAX_DURATION_MINUTES} minutes ({format_duration(MAX_DURATION_MINUTES * 60)})
+<b>🎛️ Current Settings:</b>
+• Max Duration (Regular): {MAX_DURATION_MINUTES} minutes ({MAX_DUR_STR})
 • Max File Size: {MAX_FILE_SIZE_MB} MB
-• Admin Users: {len(ADMIN_USER_IDS)} configured
+• Admin Users: {IS_ADMIN_USER_COUNT} configured
 
-*💡 Admin Privileges:*
+<b>💡 Admin Privileges:</b>
 • Can download videos of any length
 • Access to admin panel
 • Can view system statistics"""
-    else:
-        admin_text = f"""ℹ️ *User Information*
 
-👤 *User:* {user.username or user.first_name}
-🛡️ *Status:* Regular User
-⏰ *Download Limit:* {format_duration(MAX_DURATION_MINUTES * 60)} maximum
+USER_INFO_TEMPLATE = f"""ℹ️ <b>User Information</b>
 
-*📋 Your Limits:*
-• Maximum Duration: {format_duration(MAX_DURATION_MINUTES * 60)}
+👤 <b>User:</b> {{username}}
+🛡️ <b>Status:</b> Regular User
+⏰ <b>Download Limit:</b> {MAX_DUR_STR} maximum
+
+<b>📋 Your Limits:</b>
+• Maximum Duration: {MAX_DUR_STR}
 • Maximum File Size: {MAX_FILE_SIZE_MB} MB
 
-*💼 Need admin access?*
+<b>💼 Need admin access?</b>
 Contact the bot administrator to get unlimited duration access."""
+
+async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /admin command - show admin status and controls"""
+    user = update.effective_user
+    template = ADMIN_TEXT_TEMPLATE if is_admin(user.id) else USER_INFO_TEMPLATE
+    admin_text = template.format(username=html.escape(user.username or user.first_name))
     
-    await update.message.reply_text(admin_text, parse_mode='Markdown')
+    await update.message.reply_text(admin_text, parse_mode=ParseMode.HTML)
 
 def main():
     """Start the bot"""
+    # Install uvloop before the application creates its event loop
+    if uvloop:
+        uvloop.install()
+    
     # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # Let handlers run concurrently and give outgoing API calls a pool big enough for bursts
+        .concurrent_updates(True)
+        .connection_pool_size(256)
+        .pool_timeout(30)
+        .get_updates_connection_pool_size(16)
+        .rate_limiter(BotRateLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Add handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -1000,20 +1519,24 @@ def main():
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))  # Handle all text messages
     
     # Start the bot
-    print("🎵 YouTube Video & Audio Downloader Bot is running...")
-    print(f"📊 Max Duration: {format_duration(MAX_DURATION_MINUTES * 60)} (Regular users)")
-    print(f"🛡️ Admins: {len(ADMIN_USER_IDS)} configured")
-    print(f"📦 Max File Size: {MAX_FILE_SIZE_MB} MB")
-    print("⚡ Ready to serve video and audio downloads!")
+    logger.info("🎵 YouTube Video & Audio Downloader Bot is running...")
+    logger.info("📊 Max Duration: %s (Regular users)", MAX_DUR_STR)
+    logger.info("🛡️ Admins: %s configured", IS_ADMIN_USER_COUNT)
+    logger.info("📦 Max File Size: %s MB", MAX_FILE_SIZE_MB)
+    logger.info("⚡ Ready to serve video and audio downloads!")
     
     try:
         application.run_polling(drop_pending_updates=True)
     except KeyboardInterrupt:
-        print("\n👋 Bot stopped by user")
-    except Exception as e:
-        print(f"❌ Bot crashed: {e}")
-        print("🔄 Restarting in 10 seconds...")
+        logger.info("👋 Bot stopped by user")
+    except Exception:
+        logger.exception("❌ Bot crashed")
+        logger.info("🔄 Restarting in 10 seconds...")
         time.sleep(10)
+    finally:
+        # Persist anything still only in the journal if shutdown never reached post_shutdown
+        if _pending_records:
+            compact_user_database(snapshot_user_database(_DB_CACHE))
 
 if __name__ == "__main__":
     main()